@@ -3,11 +3,10 @@ import shutil
 from datetime import datetime
 
 import pandas as pd
-import pandas_ta as ta
 import pytz
 from loguru import logger
 from src.common import clean_old_backups, gen_timestamp_filename
-from src.preprocessor import MS_to_D, create_lag_feature
+from src.preprocessor import align_sources, preprocess_source
 
 # 변수 설정
 timestamp_str = datetime.now(pytz.timezone("Asia/Seoul")).strftime("%Y%m%d_%H%M%S")
@@ -22,8 +21,44 @@ log_dir = "/logs"
 os.makedirs(log_dir, exist_ok=True)
 bucket_log_dir = "/bucket/logs/Preprocess"
 
-# 대상 파일명 설정
-raw_filename_dict = {"SPY": ["spy_data.csv"], "CLI": ["cli_data.csv"]}
+# 소스 명세 설정
+# - base: 기준(거래일) 인덱스를 제공하는 소스 (하나만 True)
+# - columns: {원본 열 이름: 새 열 이름}, freq: 원본 데이터 빈도
+# - indicators: pandas_ta 지표 ('kind' + 지표 인자), lags: create_lag_feature 인자
+# - fill: 기준 인덱스에 정렬할 때의 채움 규칙 ('ffill' 또는 None)
+source_spec_dict = {
+    "SPY": {
+        "filename": "spy_data.csv",
+        "base": True,
+        "columns": {"close": "spy_close", "volume": "spy_volume"},
+        "freq": "D",
+        "indicators": [
+            {"kind": "sma", "close": "spy_close", "length": 60},
+            {"kind": "sma", "close": "spy_close", "length": 120},
+            {"kind": "bbands", "close": "spy_close", "length": 20, "std": 2},
+            {"kind": "macd", "close": "spy_close", "fast": 12, "slow": 26, "signal": 9},
+            {"kind": "rsi", "close": "spy_close", "length": 14},
+        ],
+        "lags": [
+            {
+                "target": "spy_volume",
+                "n_lags": 1,
+                "extend_rows": False,
+                "drop_target": True,
+            }
+        ],
+        "fill": "ffill",
+    },
+    "CLI": {
+        "filename": "cli_data.csv",
+        "columns": {"CLI": "CLI"},
+        "freq": "MS",
+        "lags": [
+            {"target": "CLI", "n_lags": 1, "extend_rows": True, "drop_target": True}
+        ],
+        "fill": "ffill",
+    },
+}
 total_filename = "prep_D_data.csv"
 log_filename = f"log_prep_D_{timestamp_str}.log"
 
@@ -32,67 +67,27 @@ logger.add(os.path.join(log_dir, log_filename))
 logger.info("Start Preprocess.")
 
 try:
-    # SPY
-    logger.info("Start: [SPY]")
-    # 데이터 읽기
-    raw_filedir = os.path.join(raw_data_dir, raw_filename_dict["SPY"][0])
-    logger.info(f"[SPY] raw_filedir: {raw_filedir}")
-    spy_df = pd.read_csv(raw_filedir)
-    logger.info(f"[SPY] Successfully read raw data: shape {spy_df.shape}")
-    # 데이터 전처리
-    spy_df = spy_df[["datetime", "close", "volume"]]
-    spy_df.rename(columns={"close": "spy_close", "volume": "spy_volume"}, inplace=True)
-    spy_df["ds"] = pd.to_datetime(spy_df["datetime"], format="%Y-%m-%d")
-    spy_df.set_index("ds", inplace=True)
-    spy_df.drop(columns=["datetime"], inplace=True)
-    spy_df = spy_df.sort_index()
-    # 기술적 지표 추가
-    spy_df.ta.sma(close="spy_close", length=60, append=True)
-    spy_df.ta.sma(close="spy_close", length=120, append=True)
-    spy_df.ta.bbands(close="spy_close", length=20, std=2, append=True)
-    spy_df.ta.macd(close="spy_close", fast=12, slow=26, signal=9, append=True)
-    spy_df.ta.rsi(close="spy_close", length=14, append=True)
-    # Volume Lag Feature 생성
-    spy_df = create_lag_feature(
-        df=spy_df,
-        target="spy_volume",
-        n_lags=1,
-        freq="D",
-        extend_rows=False,
-        drop_target=True,
-    )
-    logger.info(f"[SPY] Preprocessing completed: shape {spy_df.shape}")
-    logger.info("End: [SPY]")
-
-    # CLI
-    logger.info("Start: [CLI]")
-    # 데이터 읽기
-    raw_filedir = os.path.join(raw_data_dir, raw_filename_dict["CLI"][0])
-    logger.info(f"[CLI] raw_filedir: {raw_filedir}")
-    cli_df = pd.read_csv(raw_filedir)
-    logger.info(f"[CLI] Successfully read raw data: shape {cli_df.shape}")
-    # 데이터 전처리
-    cli_df = cli_df[["datetime", "CLI"]]
-    cli_df["ds"] = pd.to_datetime(cli_df["datetime"], format="%Y-%m-%d")
-    cli_df.set_index("ds", inplace=True)
-    cli_df.drop(columns=["datetime"], inplace=True)
-    cli_df = cli_df.sort_index()
-    # Lag Feature 생성
-    cli_df = create_lag_feature(
-        df=cli_df, target="CLI", n_lags=1, freq="MS", extend_rows=True, drop_target=True
-    )
-    # 월별 데이터를 일별로 확장 및 ffill
-    cli_df = MS_to_D(cli_df, ffill=True)
-    logger.info(f"[CLI] Preprocessing completed: shape {cli_df.shape}")
-    logger.info("End: [CLI]")
+    source_df_dict = {}
+    for symbol, spec in source_spec_dict.items():
+        logger.info(f"Start: [{symbol}]")
+        # 데이터 읽기
+        raw_filedir = os.path.join(raw_data_dir, spec["filename"])
+        logger.info(f"[{symbol}] raw_filedir: {raw_filedir}")
+        raw_df = pd.read_csv(raw_filedir)
+        logger.info(f"[{symbol}] Successfully read raw data: shape {raw_df.shape}")
+        # 데이터 전처리 (기술적 지표 및 Lag Feature 생성)
+        source_df_dict[symbol] = preprocess_source(raw_df, spec)
+        logger.info(
+            f"[{symbol}] Preprocessing completed: shape {source_df_dict[symbol].shape}"
+        )
+        logger.info(f"End: [{symbol}]")
 
     # 최종 데이터
     logger.info("Start: [Total]")
-    # 데이터 병합
-    total_df = pd.merge(spy_df, cli_df, left_index=True, right_index=True, how="left")
+    # 데이터 병합 (기준 소스의 거래일 인덱스에 나머지 소스를 정렬)
+    total_df = align_sources(source_df_dict, source_spec_dict)
     logger.info(f"[Total] Merged DataFrame : shape {total_df.shape}")
     # NaN 처리
-    total_df = total_df.ffill()
     total_df = total_df.dropna(how="any")
     total_df = total_df.round(6)
     logger.info(f"[Total] Preprocessing completed: shape {total_df.shape}")
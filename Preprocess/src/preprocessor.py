@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+import pandas_ta  # noqa: F401  (DataFrame.ta accessor 등록)
 
 
 def create_lag_feature(df, target, n_lags, freq, extend_rows=False, drop_target=False):
@@ -41,37 +43,110 @@ def create_lag_feature(df, target, n_lags, freq, extend_rows=False, drop_target=
     return new_df
 
 
-def MS_to_D(df, ffill=False):
+def preprocess_source(df, spec):
     """
-    월초(freq='MS') DatetimeIndex를 가진 DataFrame을
-    일별(Daily) 빈도로 확장하고, 필요 시 NaN 값을 ffill로 채웁니다.
+    원본 DataFrame을 소스 명세(spec)에 따라 전처리합니다.
+    (열 선택/이름 변경 -> DatetimeIndex 설정 -> 기술적 지표 -> Lag 변수 순서)
 
     Args:
-        df (pd.DataFrame): 월별 DatetimeIndex를 가진 DataFrame.
-        ffill (bool, optional): True이면 NaN 값을 forward fill로 채웁니다.
-            기본값은 False입니다.
+        df (pd.DataFrame): 'datetime' 열(형식 '%Y-%m-%d')을 가진 원본 데이터프레임.
+        spec (dict): 소스 명세. 사용하는 키는 다음과 같습니다.
+            - columns (dict): {원본 열 이름: 새 열 이름}.
+            - freq (str): 원본 데이터의 빈도 문자열 (예: 'D', 'MS').
+            - indicators (list[dict], optional): pandas_ta 지표 목록.
+              'kind'는 지표 이름, 나머지 키는 해당 지표의 인자 (예: {'kind': 'sma', 'close': 'spy_close', 'length': 60}).
+            - lags (list[dict], optional): create_lag_feature 인자 목록
+              ('target', 'n_lags', 'extend_rows', 'drop_target').
 
     Returns:
-        new_df (pd.DataFrame): 일별 빈도로 확장되고 ffill 처리된 DataFrame.
+        new_df (pd.DataFrame): 정렬된 DatetimeIndex(이름 'ds')를 가진 전처리된 데이터프레임.
     """
+    columns = spec["columns"]
+    new_df = df[["datetime", *columns.keys()]].rename(columns=columns)
+    new_df["ds"] = pd.to_datetime(new_df["datetime"], format="%Y-%m-%d")
+    new_df = new_df.set_index("ds").drop(columns=["datetime"]).sort_index()
+
+    # 기술적 지표 추가
+    for indicator in spec.get("indicators", []):
+        kwargs = {k: v for k, v in indicator.items() if k != "kind"}
+        getattr(new_df.ta, indicator["kind"])(**kwargs, append=True)
+
+    # Lag Feature 생성
+    for lag in spec.get("lags", []):
+        new_df = create_lag_feature(
+            df=new_df,
+            target=lag["target"],
+            n_lags=lag["n_lags"],
+            freq=spec["freq"],
+            extend_rows=lag.get("extend_rows", False),
+            drop_target=lag.get("drop_target", False),
+        )
 
-    new_df = df.copy()
-    new_df = new_df.sort_index()
+    return new_df
 
-    # 1. 일별 DatetimeIndex 생성
-    daily_index = pd.date_range(
-        start=new_df.index.min(),
-        end=new_df.index.max() + pd.tseries.frequencies.to_offset("MS"),
-        freq="D",  # 일별 빈도(Daily Frequency) 지정
-    )
 
-    # 2. Reindex (일별 인덱스로 확장)
-    index_name = new_df.index.name if new_df.index.name else "ds"
-    new_df = new_df.reindex(daily_index)
-    new_df.index.name = index_name
+def align_sources(source_df_dict, source_spec_dict):
+    """
+    여러 소스 DataFrame을 기준(base) 소스의 인덱스(거래일)에 정렬하여 하나로 합칩니다.
 
-    # 3. ffill (Forward Fill)
-    if ffill:
-        new_df = new_df.ffill()
+    기준 소스는 source_spec_dict에서 'base'가 True인 소스 하나입니다.
+    나머지 소스는 소스마다 기준 날짜에 대해 이진 탐색(as-of join)을 수행하므로,
+    비용은 소스당 O(B log S) 입니다 (B: 기준 행 수, S: 소스 행 수).
+    pd.merge를 반복하거나 병합된 전체 프레임을 ffill하지 않습니다.
 
+    Args:
+        source_df_dict (dict): {소스 이름: DatetimeIndex로 정렬된 데이터프레임}.
+        source_spec_dict (dict): {소스 이름: 소스 명세}. 사용하는 키는 다음과 같습니다.
+            - base (bool, optional): True이면 기준 소스. 정확히 하나의 소스만 True여야 합니다.
+            - fill (str or None, optional): 채움 규칙.
+              - 'ffill': 기준 날짜 이전(당일 포함)의 가장 최근 값을 사용 (소스 내부 NaN도 ffill).
+              - None: 날짜가 정확히 일치하는 행만 사용하고, 없으면 NaN.
+
+    Returns:
+        new_df (pd.DataFrame): 기준 소스의 열 뒤에 나머지 소스의 열이 순서대로 붙은 데이터프레임.
+    """
+    base_names = [k for k, v in source_spec_dict.items() if v.get("base")]
+    if len(base_names) != 1:
+        raise ValueError(
+            f"Exactly one source must have base=True, got {len(base_names)}: {base_names}"
+        )
+    base_name = base_names[0]
+
+    # 채움 규칙 검증 및 소스 내부 ffill
+    filled_df_dict = {}
+    for name, source_df in source_df_dict.items():
+        fill = source_spec_dict[name].get("fill")
+        if fill == "ffill":
+            source_df = source_df.ffill()
+        elif fill is not None:
+            raise ValueError(f"Unknown fill rule for [{name}]: {fill}")
+        filled_df_dict[name] = source_df
+
+    base_df = filled_df_dict.pop(base_name)
+    base_keys = base_df.index.to_numpy(dtype="datetime64[ns]")
+
+    aligned_list = [base_df]
+    for name, source_df in filled_df_dict.items():
+        keys = source_df.index.to_numpy(dtype="datetime64[ns]")
+        if keys.size == 0:
+            # 데이터가 없는 소스는 전체 NaN
+            aligned_list.append(
+                pd.DataFrame(np.nan, index=base_df.index, columns=source_df.columns)
+            )
+            continue
+
+        # 각 기준 날짜 이전(당일 포함)에 등장한 마지막 소스 행의 위치
+        pos = np.searchsorted(keys, base_keys, side="right") - 1
+        valid = pos >= 0
+        pos = np.maximum(pos, 0)
+        if source_spec_dict[name].get("fill") is None:
+            valid &= keys[pos] == base_keys
+
+        aligned_df = source_df.iloc[pos]
+        aligned_df.index = base_df.index
+        aligned_list.append(
+            aligned_df.where(pd.Series(valid, index=base_df.index), axis=0)
+        )
+
+    new_df = pd.concat(aligned_list, axis=1)
     return new_df